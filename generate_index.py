@@ -9,14 +9,27 @@ This script creates:
 """
 
 import os
+import shutil
 import sys
 import json
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 import hashlib
 import re
 
+# Splits a wheel filename into the package name and everything from the
+# version onwards (the first hyphen-separated component starting with a digit)
+WHEEL_FILENAME_RE = re.compile(r'^(?P<name>.+?)-(?P<rest>\d.*)\.whl$')
 
+# Wheel hashes from previous runs, kept outside the published output directory.
+# Entries are keyed by mtime, so this only helps repeated local runs: CI copies
+# the wheels fresh and does not persist .cache/, so there every wheel is a miss
+HASH_CACHE_FILE = Path('.cache') / 'wheel-hashes.json'
+
+
+@lru_cache(maxsize=None)
 def get_package_name_from_wheel(wheel_filename):
     """
     Extract the package name from a wheel filename, preserving case.
@@ -26,27 +39,21 @@ def get_package_name_from_wheel(wheel_filename):
     packages with the same name but different cases (e.g., 'PyYAML' vs 'pyyaml')
     to be kept separate in the index.
     """
-    # Remove .whl extension
-    name_without_ext = wheel_filename.replace('.whl', '')
-    
-    # Split on hyphens
-    parts = name_without_ext.split('-')
-    
-    # Find the first part that looks like a version (starts with a digit)
-    # According to PEP 427, version is the second component and starts with a digit
-    for i, part in enumerate(parts):
-        if part and part[0].isdigit():
-            # Everything before this is the package name
-            package_name = '-'.join(parts[:i])
-            # Normalize underscores to hyphens but preserve case
-            return package_name.replace('_', '-')
+    # The name is everything before the first component that looks like a
+    # version (starts with a digit), as per PEP 427
+    match = WHEEL_FILENAME_RE.match(wheel_filename)
+    if match:
+        # Normalize underscores to hyphens but preserve case
+        return match.group('name').replace('_', '-')
     
     # Fallback: if no version found, assume first part is package name
-    if parts:
-        return parts[0].replace('_', '-')
+    name_without_ext = wheel_filename.replace('.whl', '')
+    if name_without_ext:
+        return name_without_ext.split('-', 1)[0].replace('_', '-')
     return None
 
 
+@lru_cache(maxsize=None)
 def rename_wheel_for_alias(wheel_filename, old_name, new_name):
     """
     Rename a wheel file to use a different package name (for aliases).
@@ -59,40 +66,217 @@ def rename_wheel_for_alias(wheel_filename, old_name, new_name):
     Returns:
         New wheel filename with the package name replaced
     """
-    # Remove .whl extension
-    name_without_ext = wheel_filename.replace('.whl', '')
-    
-    # Split on hyphens
-    parts = name_without_ext.split('-')
-    
-    # Find the first part that looks like a version (starts with a digit)
-    for i, part in enumerate(parts):
-        if part and part[0].isdigit():
-            # Replace the package name parts (everything before version)
-            old_package_parts = parts[:i]
-            old_package_name = '-'.join(old_package_parts).replace('_', '-')
-            
-            # Check if this matches the old_name (case-insensitive)
-            if old_package_name.lower() == old_name.lower():
-                # Replace with new name (preserve underscores if original had them)
-                new_package_name = new_name.replace('-', '_') if '_' in '-'.join(old_package_parts) else new_name
-                new_parts = [new_package_name] + parts[i:]
-                return '-'.join(new_parts) + '.whl'
+    match = WHEEL_FILENAME_RE.match(wheel_filename)
+    if match:
+        old_package_name = match.group('name')
+        
+        # Check if this matches the old_name (case-insensitive)
+        if old_package_name.replace('_', '-').lower() == old_name.lower():
+            # Replace with new name (preserve underscores if original had them)
+            new_package_name = new_name.replace('-', '_') if '_' in old_package_name else new_name
+            return f"{new_package_name}-{match.group('rest')}.whl"
     
     # If we can't parse it properly, return original
     return wheel_filename
 
 
-def calculate_hash(filepath, algorithm='sha256'):
-    """Calculate hash of a file."""
-    hash_obj = hashlib.new(algorithm)
-    with open(filepath, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
-            hash_obj.update(chunk)
+def iter_wheels(root):
+    """
+    Recursively find wheel files under root.
+
+    Walks the tree with os.scandir, which reuses the file type information
+    from the directory listing instead of stat-ing every entry.
+
+    Yields:
+        (wheel_file, wheel_path) tuples
+    """
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith('.whl') and entry.is_file():
+                    yield entry.name, Path(entry.path)
+
+
+def get_sidecar_path(filepath):
+    """Return the path of the {wheel}.sha256 sidecar file for a wheel."""
+    filepath = Path(filepath)
+    return filepath.with_name(filepath.name + '.sha256')
+
+
+def read_hash_sidecar(filepath):
+    """
+    Return the SHA-256 recorded in a wheel's sidecar file.
+    
+    Returns None if there is no sidecar, or if it is older than the wheel
+    (the wheel was rebuilt after the sidecar was written).
+    """
+    sidecar_path = get_sidecar_path(filepath)
+    try:
+        if sidecar_path.stat().st_mtime_ns < os.stat(filepath).st_mtime_ns:
+            return None
+        content = sidecar_path.read_text().split()
+    except OSError:
+        return None
+    if content and re.fullmatch(r'[0-9a-fA-F]{64}', content[0]):
+        return content[0].lower()
+    return None
+
+
+def write_hash_sidecar(filepath, file_hash):
+    """Record a wheel's SHA-256 in its sidecar file, in sha256sum format."""
+    get_sidecar_path(filepath).write_text(f"{file_hash}  {Path(filepath).name}\n")
+
+
+def calculate_hash(filepath, algorithm='sha256', use_sidecar=True):
+    """
+    Calculate hash of a file.
+    
+    For SHA-256, a hash recorded in an up-to-date {wheel}.sha256 sidecar file
+    next to the file is used instead of reading the file, unless use_sidecar
+    is False.
+    """
+    if algorithm == 'sha256':
+        if use_sidecar:
+            sidecar_hash = read_hash_sidecar(filepath)
+            if sidecar_hash:
+                return sidecar_hash
+        # Use the sha256 constructor directly to skip hashlib.new()'s name lookup
+        constructor = hashlib.sha256
+    else:
+        constructor = partial(hashlib.new, algorithm)
+
+    with open(filepath, 'rb', buffering=0) as f:
+        if hasattr(hashlib, 'file_digest'):
+            # Python 3.11+: hashes in C with large buffers, releasing the GIL
+            return hashlib.file_digest(f, constructor).hexdigest()
+
+        # Older Python: read 1 MiB at a time into a reusable buffer
+        hash_obj = constructor()
+        buf = bytearray(1 << 20)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hash_obj.update(view[:n])
     return hash_obj.hexdigest()
 
 
-def generate_package_index(package_name, wheels, output_dir, rename_from=None, rename_to=None):
+def load_hash_cache(cache_file):
+    """Load the hash cache from disk, returning an empty cache if unavailable."""
+    if not cache_file.exists():
+        return {}
+    try:
+        cache = json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        cache = None
+    if not isinstance(cache, dict):
+        print(f"Warning: Ignoring unreadable hash cache {cache_file}")
+        return {}
+    return cache
+
+
+def save_hash_cache(cache_file, cache):
+    """Write the hash cache to disk, warning instead of failing if it cannot be written."""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(cache))
+    except OSError as e:
+        print(f"Warning: Could not write hash cache {cache_file}: {e}")
+
+
+def hash_all(paths, cache=None, use_sidecars=True):
+    """
+    Calculate hashes for many files concurrently.
+
+    hashlib releases the GIL while digesting large buffers, so wheels can be
+    hashed in parallel across threads.
+
+    Args:
+        paths: Paths of the files to hash
+        cache: Optional dict of previously calculated hashes keyed by
+            "path|size|mtime_ns". Only files missing from it are hashed, and
+            it is updated in place to hold exactly the entries for paths.
+        use_sidecars: Whether hashes may be read from {wheel}.sha256 files
+
+    Returns:
+        Dict mapping each path to its hash
+    """
+    hashes = {}
+    keys = {}
+    to_hash = []
+    for path in paths:
+        if cache is not None:
+            st = os.stat(path)
+            keys[path] = f"{path}|{st.st_size}|{st.st_mtime_ns}"
+            if keys[path] in cache:
+                hashes[path] = cache[keys[path]]
+                continue
+        to_hash.append(path)
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            hash_file = partial(calculate_hash, use_sidecar=use_sidecars)
+            hashes.update(zip(to_hash, executor.map(hash_file, to_hash)))
+
+    if cache is not None:
+        # Drop entries for wheels that no longer exist or have changed
+        cache.clear()
+        cache.update((keys[path], hashes[path]) for path in paths)
+
+    return hashes
+
+
+def stage_wheel(src, dest):
+    """
+    Place a wheel at dest, hardlinking to src when possible.
+
+    Hardlinks avoid copying the wheel's bytes; if src and dest are on
+    different filesystems (or links are unsupported), the wheel is copied.
+    Nothing is done if dest already is src (e.g. the wheels directory is
+    inside the output directory), so the source wheel is never removed.
+    """
+    if dest.exists() and os.path.samefile(src, dest):
+        return
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def link_alias_wheel(canonical_path, dest):
+    """
+    Place an alias index's wheel at dest as a relative symlink to canonical_path.
+
+    Falls back to stage_wheel() where symlinks cannot be created.
+    """
+    if dest.exists() and os.path.samefile(canonical_path, dest):
+        return
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+    try:
+        os.symlink(os.path.relpath(canonical_path, dest.parent), dest)
+    except OSError:
+        stage_wheel(canonical_path, dest)
+
+
+def write_index(index_path, html_parts):
+    """Write the joined HTML parts to index_path as UTF-8 with a single write call."""
+    data = memoryview(''.join(html_parts).encode('utf-8'))
+    fd = os.open(index_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def generate_package_index(package_name, wheels, output_dir, hashes, rename_from=None, rename_to=None):
     """
     Generate index.html for a specific package.
     
@@ -100,13 +284,14 @@ def generate_package_index(package_name, wheels, output_dir, rename_from=None, r
         package_name: Name for the package directory
         wheels: List of (wheel_file, wheel_path) tuples
         output_dir: Output directory for the index
+        hashes: Dict mapping wheel paths to their precomputed hashes
         rename_from: Original package name (for renaming wheels in alias indexes)
         rename_to: New package name to use in wheel filenames (for alias indexes)
     """
     package_dir = output_dir / package_name
     package_dir.mkdir(parents=True, exist_ok=True)
     
-    html_content = f"""<!DOCTYPE html>
+    html_parts = [f"""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="utf-8">
@@ -114,11 +299,11 @@ def generate_package_index(package_name, wheels, output_dir, rename_from=None, r
 </head>
 <body>
     <h1>Links for {package_name}</h1>
-"""
+"""]
     
     for wheel_file, wheel_path in wheels:
-        # Calculate hash
-        file_hash = calculate_hash(wheel_path)
+        # Hashes are computed once in main() and shared with alias indexes
+        file_hash = hashes[wheel_path]
         
         # Rename wheel file if this is an alias index
         if rename_from and rename_to:
@@ -126,27 +311,30 @@ def generate_package_index(package_name, wheels, output_dir, rename_from=None, r
         else:
             display_wheel_file = wheel_file
         
-        # Copy wheel to package directory
+        # Link or copy wheel into package directory
         dest_path = package_dir / display_wheel_file
-        if wheel_path != dest_path:
-            import shutil
-            shutil.copy2(wheel_path, dest_path)
+        canonical_path = output_dir / rename_from / wheel_file if rename_from else None
+        if canonical_path and canonical_path.exists():
+            # Alias indexes reference the wheel already staged for the canonical index
+            link_alias_wheel(canonical_path, dest_path)
+        elif wheel_path != dest_path:
+            stage_wheel(wheel_path, dest_path)
         
         # Add link with hash
-        html_content += f'    <a href="{display_wheel_file}#sha256={file_hash}">{display_wheel_file}</a><br/>\n'
+        html_parts.append(f'    <a href="{display_wheel_file}#sha256={file_hash}">{display_wheel_file}</a><br/>\n')
     
-    html_content += """</body>
+    html_parts.append("""</body>
 </html>
-"""
+""")
     
     index_path = package_dir / 'index.html'
-    index_path.write_text(html_content)
+    write_index(index_path, html_parts)
     print(f"Generated index for {package_name} at {index_path}")
 
 
 def generate_root_index(packages, output_dir):
     """Generate the root index.html listing all packages."""
-    html_content = """<!DOCTYPE html>
+    html_parts = ["""<!DOCTYPE html>
 <html>
 <head>
     <meta charset="utf-8">
@@ -155,31 +343,35 @@ def generate_root_index(packages, output_dir):
 <body>
     <h1>Platform Wheels Index</h1>
     <p>Simple PyPI-like index for platform-specific Python wheels.</p>
-"""
+"""]
     
-    for package_name in sorted(packages):
-        html_content += f'    <a href="{package_name}/">{package_name}</a><br/>\n'
+    html_parts.extend(f'    <a href="{package_name}/">{package_name}</a><br/>\n'
+                      for package_name in sorted(packages))
     
-    html_content += """</body>
+    html_parts.append("""</body>
 </html>
-"""
+""")
     
     index_path = output_dir / 'index.html'
-    index_path.write_text(html_content)
+    write_index(index_path, html_parts)
     print(f"Generated root index at {index_path}")
 
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: generate_index.py <wheels_dir> <output_dir> [packages_metadata.json]")
+    args = [arg for arg in sys.argv[1:] if arg != '--sidecars']
+    write_sidecars = len(args) != len(sys.argv) - 1
+    
+    if len(args) < 2:
+        print("Usage: generate_index.py [--sidecars] <wheels_dir> <output_dir> [packages_metadata.json]")
+        print("  --sidecars: Write a {wheel}.sha256 file next to each wheel for future runs")
         print("  wheels_dir: Directory containing .whl files")
         print("  output_dir: Directory where index will be generated")
         print("  packages_metadata.json: Optional JSON file with package metadata (including aliases)")
         sys.exit(1)
     
-    wheels_dir = Path(sys.argv[1])
-    output_dir = Path(sys.argv[2])
-    packages_metadata_file = Path(sys.argv[3]) if len(sys.argv) > 3 else None
+    wheels_dir = Path(args[0])
+    output_dir = Path(args[1])
+    packages_metadata_file = Path(args[2]) if len(args) > 2 else None
     
     if not wheels_dir.exists():
         print(f"Error: Wheels directory {wheels_dir} does not exist")
@@ -212,8 +404,7 @@ def main():
     # Find all wheel files and group by package
     packages = defaultdict(list)
     
-    for wheel_path in wheels_dir.glob('**/*.whl'):
-        wheel_file = wheel_path.name
+    for wheel_file, wheel_path in iter_wheels(wheels_dir):
         package_name = get_package_name_from_wheel(wheel_file)
         
         if package_name:
@@ -228,13 +419,26 @@ def main():
         generate_root_index([], output_dir)
         return
     
+    # Hash all wheels up front, in parallel, skipping unchanged wheels
+    # whose hashes are already cached from a previous run
+    # When writing sidecars, every wheel is hashed from its contents so that
+    # stale sidecars and cache entries are replaced rather than trusted
+    hash_cache = {} if write_sidecars else load_hash_cache(HASH_CACHE_FILE)
+    all_paths = [wheel_path for wheels in packages.values() for _, wheel_path in wheels]
+    hashes = hash_all(all_paths, hash_cache, use_sidecars=not write_sidecars)
+    save_hash_cache(HASH_CACHE_FILE, hash_cache)
+    
+    if write_sidecars:
+        for wheel_path, file_hash in hashes.items():
+            write_hash_sidecar(wheel_path, file_hash)
+    
     # Track all package names (including aliases) for the root index
     all_package_names = set()
     
     # Generate per-package indexes
     for package_name, wheels in packages.items():
         # Generate index for the wheel's actual package name
-        generate_package_index(package_name, wheels, output_dir)
+        generate_package_index(package_name, wheels, output_dir, hashes)
         all_package_names.add(package_name)
         
         # Check if this wheel package name has a configured alias
@@ -244,7 +448,7 @@ def main():
         if configured_name and configured_name != package_name:
             print(f"Generating additional index: {configured_name} -> {package_name}")
             # Generate index under the configured name with renamed wheels
-            generate_package_index(configured_name, wheels, output_dir, 
+            generate_package_index(configured_name, wheels, output_dir, hashes,
                                  rename_from=package_name, rename_to=configured_name)
             all_package_names.add(configured_name)
     
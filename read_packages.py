@@ -9,26 +9,147 @@ Configuration Priority:
 3. packages.txt (simple list for backward compatibility)
 """
 
+import heapq
 import json
 import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from graphlib import CycleError, TopologicalSorter
 from pathlib import Path
 
+# Matches the package name at the start of a package spec, stopping at any
+# version specifier, extras list, environment marker or whitespace
+SPEC_NAME_RE = re.compile(r'[^=<>!~\[;\s]+')
 
-def read_recipe(recipe_dir):
-    """Read a single recipe from recipes/package-name/recipe.yaml."""
+# Parsed recipes from previous runs, keyed by recipe file path
+RECIPE_CACHE_FILE = Path('.cache') / 'recipes.json'
+
+
+@lru_cache(maxsize=None)
+def get_yaml():
+    """
+    Import PyYAML on first use, exiting with an error if it is not installed.
+    
+    Returns:
+        (yaml module, loader) tuple, where loader is the libyaml-backed safe
+        loader, or the pure-Python one if PyYAML was built without libyaml
+    """
     try:
         import yaml
     except ImportError:
         print("Error: PyYAML not installed. Install with: pip install pyyaml", file=sys.stderr)
         sys.exit(1)
     
+    loader = getattr(yaml, 'CSafeLoader', None)
+    if loader is None:
+        print("Note: PyYAML was built without libyaml, using the slower pure-Python loader", file=sys.stderr)
+        loader = yaml.SafeLoader
+    return yaml, loader
+
+
+def load_yaml(path, cache=None):
+    """
+    Parse a YAML file with the fastest available safe loader.
+    
+    If cache is given, it maps file paths to their size, mtime and parsed
+    content; unchanged files are returned from it without being parsed, and
+    it is updated with the content of files that were parsed.
+    """
+    if cache is not None:
+        st = os.stat(path)
+        entry = cache.get(str(path))
+        if (isinstance(entry, dict) and 'data' in entry
+                and entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns):
+            return entry['data']
+    
+    yaml, loader = get_yaml()
+    # Pass raw bytes so libyaml decodes the input itself
+    with open(path, 'rb') as f:
+        data = yaml.load(f, Loader=loader)
+    
+    if cache is not None:
+        cache[str(path)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'data': data}
+    return data
+
+
+def load_recipe_cache(cache_file):
+    """Load the parsed recipe cache, returning an empty cache if unavailable."""
+    if not cache_file.exists():
+        return {}
+    try:
+        cache = json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        cache = None
+    if not isinstance(cache, dict):
+        print(f"Warning: Ignoring unreadable recipe cache {cache_file}", file=sys.stderr)
+        return {}
+    return cache
+
+
+def save_recipe_cache(cache_file, cache):
+    """Write the parsed recipe cache to disk, warning instead of failing if it cannot be written."""
+    entries = []
+    for path, entry in cache.items():
+        # Skip recipes whose YAML does not survive a JSON round trip unchanged
+        # (e.g. dates or non-string keys); they are simply parsed every run
+        try:
+            encoded = json.dumps(entry)
+        except (TypeError, ValueError):
+            continue
+        if json.loads(encoded) == entry:
+            entries.append(f"{json.dumps(path)}: {encoded}")
+    
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text('{' + ', '.join(entries) + '}')
+    except OSError as e:
+        print(f"Warning: Could not write recipe cache {cache_file}: {e}", file=sys.stderr)
+
+
+def make_package_info(name, spec, cibw_environment=None, **fields):
+    """
+    Build a package entry with the fields expected by the workflow.
+    
+    Fields not passed keep their defaults. cibw_environment may be a dict of
+    environment variables, which is formatted as a CIBW_ENVIRONMENT string.
+    """
+    package_info = {
+        'spec': spec,
+        'name': name,
+        'alias': '',
+        'source': 'pypi',
+        'host_dependencies': [],
+        'pip_dependencies': [],
+        'build_dependencies': [],
+        'patches': [],
+        'cibw_environment': '',
+        'cibw_before_all': '',
+        'cibw_config_settings': '',
+    }
+    package_info.update(fields)
+    
+    # Convert cibw_environment dict to CIBW_ENVIRONMENT string format
+    if cibw_environment and isinstance(cibw_environment, dict):
+        # Format as VAR1=val1 VAR2=val2
+        env_pairs = [f'{k}={v}' for k, v in cibw_environment.items()]
+        package_info['cibw_environment'] = ' '.join(env_pairs)
+    
+    return package_info
+
+
+def read_recipe(recipe_dir, cache=None):
+    """
+    Read a single recipe from recipes/package-name/recipe.yaml.
+    
+    cache is an optional parsed recipe cache, as used by load_yaml().
+    """
     recipe_file = recipe_dir / 'recipe.yaml'
     if not recipe_file.exists():
         return None
     
-    with open(recipe_file, 'r') as f:
-        recipe = yaml.safe_load(f)
+    recipe = load_yaml(recipe_file, cache)
     
     if not recipe or 'package' not in recipe:
         print(f"Warning: Invalid recipe in {recipe_dir}", file=sys.stderr)
@@ -45,28 +166,19 @@ def read_recipe(recipe_dir):
     if 'version' in pkg and pkg['version']:
         spec = f"{name}{pkg['version']}"
     
-    package_info = {
-        'spec': spec,
-        'name': name,
-        'alias': pkg.get('alias', ''),
-        'source': recipe.get('source', pkg.get('source', 'pypi')),
-        'host_dependencies': recipe.get('host_dependencies', []),
-        'pip_dependencies': recipe.get('pip_dependencies', []),
-        'build_dependencies': recipe.get('build_dependencies', []),
-        'patches': [],
-        'cibw_environment': '',  # Will be formatted as CIBW_ENVIRONMENT string
-        'cibw_before_all': recipe.get('cibw_before_all', ''),
-        'cibw_config_settings': recipe.get('cibw_config_settings', ''),
-        'skip_platforms': recipe.get('skip_platforms', []),
-    }
-    
-    # Convert cibw_environment dict to CIBW_ENVIRONMENT string format
-    if 'cibw_environment' in recipe and recipe['cibw_environment']:
-        env_dict = recipe['cibw_environment']
-        if isinstance(env_dict, dict):
-            # Format as VAR1=val1 VAR2=val2
-            env_pairs = [f'{k}={v}' for k, v in env_dict.items()]
-            package_info['cibw_environment'] = ' '.join(env_pairs)
+    package_info = make_package_info(
+        name,
+        spec,
+        alias=pkg.get('alias', ''),
+        source=recipe.get('source', pkg.get('source', 'pypi')),
+        host_dependencies=recipe.get('host_dependencies', []),
+        pip_dependencies=recipe.get('pip_dependencies', []),
+        build_dependencies=recipe.get('build_dependencies', []),
+        cibw_environment=recipe.get('cibw_environment'),
+        cibw_before_all=recipe.get('cibw_before_all', ''),
+        cibw_config_settings=recipe.get('cibw_config_settings', ''),
+        skip_platforms=recipe.get('skip_platforms', []),
+    )
     
     # Add URL if specified
     if 'url' in recipe:
@@ -79,8 +191,10 @@ def read_recipe(recipe_dir):
     # Handle case where patches key exists but is None (e.g., all patches commented out)
     if patches is None:
         patches = []
+    # Recipe directory relative to the repository root, computed once for all patches
+    recipe_rel = os.path.relpath(recipe_dir)
     for patch in patches:
-        if patch.startswith('http://') or patch.startswith('https://'):
+        if patch.startswith(('http://', 'https://')):
             # External URL patch
             package_info['patches'].append(patch)
         else:
@@ -89,7 +203,10 @@ def read_recipe(recipe_dir):
             if patch_path.exists():
                 # Convert to path relative to repository root for $GITHUB_WORKSPACE
                 # This ensures it works on both Linux and macOS runners
-                relative_to_repo = os.path.relpath(patch_path, Path.cwd())
+                if os.path.isabs(patch):
+                    relative_to_repo = os.path.relpath(patch)
+                else:
+                    relative_to_repo = os.path.normpath(os.path.join(recipe_rel, patch))
                 package_info['patches'].append(relative_to_repo)
             else:
                 print(f"Warning: Patch file not found: {patch_path}", file=sys.stderr)
@@ -103,28 +220,27 @@ def read_recipes_dir():
     if not recipes_dir.exists():
         return []
     
-    packages_data = []
+    # DirEntry.is_dir() reuses the file type from the directory listing
+    with os.scandir(recipes_dir) as entries:
+        recipe_dirs = [Path(e.path) for e in sorted(entries, key=lambda e: e.name) if e.is_dir()]
+    
+    # Reuse parsed content of recipes that have not changed since the last run
+    cache = load_recipe_cache(RECIPE_CACHE_FILE)
+    
+    # Parse recipes concurrently; map() yields results in input (directory name) order
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        packages_data = [info for info in executor.map(partial(read_recipe, cache=cache), recipe_dirs) if info]
     
-    # Iterate through each subdirectory in recipes/
-    for recipe_dir in sorted(recipes_dir.iterdir()):
-        if recipe_dir.is_dir():
-            package_info = read_recipe(recipe_dir)
-            if package_info:
-                packages_data.append(package_info)
+    # Drop entries for recipes that no longer exist
+    current_files = {str(d / 'recipe.yaml') for d in recipe_dirs}
+    save_recipe_cache(RECIPE_CACHE_FILE, {k: v for k, v in cache.items() if k in current_files})
     
     return packages_data
 
 
 def read_yaml_config(config_file):
     """Read packages from YAML configuration file."""
-    try:
-        import yaml
-    except ImportError:
-        print("Error: PyYAML not installed. Install with: pip install pyyaml", file=sys.stderr)
-        sys.exit(1)
-    
-    with open(config_file, 'r') as f:
-        config = yaml.safe_load(f)
+    config = load_yaml(config_file)
     
     packages_data = []
     
@@ -143,27 +259,19 @@ def read_yaml_config(config_file):
         if 'version' in pkg:
             spec = f"{name}{pkg['version']}"
         
-        package_info = {
-            'spec': spec,
-            'name': name,
-            'alias': pkg.get('alias', ''),
-            'source': pkg.get('source', 'pypi'),
-            'host_dependencies': pkg.get('host_dependencies', []),
-            'pip_dependencies': pkg.get('pip_dependencies', []),
-            'build_dependencies': pkg.get('build_dependencies', []),
-            'patches': pkg.get('patches', []),
-            'cibw_environment': '',
-            'cibw_before_all': pkg.get('cibw_before_all', ''),
-            'cibw_config_settings': pkg.get('cibw_config_settings', ''),
-        }
-        
-        # Convert cibw_environment dict to CIBW_ENVIRONMENT string format
-        if 'cibw_environment' in pkg and pkg['cibw_environment']:
-            env_dict = pkg['cibw_environment']
-            if isinstance(env_dict, dict):
-                # Format as VAR1=val1 VAR2=val2
-                env_pairs = [f'{k}={v}' for k, v in env_dict.items()]
-                package_info['cibw_environment'] = ' '.join(env_pairs)
+        package_info = make_package_info(
+            name,
+            spec,
+            alias=pkg.get('alias', ''),
+            source=pkg.get('source', 'pypi'),
+            host_dependencies=pkg.get('host_dependencies', []),
+            pip_dependencies=pkg.get('pip_dependencies', []),
+            build_dependencies=pkg.get('build_dependencies', []),
+            patches=pkg.get('patches', []),
+            cibw_environment=pkg.get('cibw_environment'),
+            cibw_before_all=pkg.get('cibw_before_all', ''),
+            cibw_config_settings=pkg.get('cibw_config_settings', ''),
+        )
         
         # Add URL if specified
         if 'url' in pkg:
@@ -178,32 +286,23 @@ def read_txt_config(config_file):
     """Read packages from simple text file (backward compatibility)."""
     packages_data = []
     
-    with open(config_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            # Skip empty lines and comments
-            if not line or line.startswith('#'):
-                continue
-            
-            # Simple format: just package spec
-            # Extract package name from spec
-            name = line.split('==')[0].split('>=')[0].split('<=')[0].split('!=')[0].split('~=')[0].split('[')[0]
-            
-            package_info = {
-                'spec': line,
-                'name': name,
-                'alias': '',
-                'source': 'pypi',
-                'host_dependencies': [],
-                'pip_dependencies': [],
-                'build_dependencies': [],
-                'patches': [],
-                'cibw_environment': '',
-                'cibw_before_all': '',
-                'cibw_config_settings': '',
-            }
-            
-            packages_data.append(package_info)
+    # Read the whole file as bytes and only decode lines that are kept
+    with open(config_file, 'rb') as f:
+        raw_lines = f.read().splitlines()
+    
+    for raw_line in raw_lines:
+        raw_line = raw_line.strip()
+        # Skip empty lines and comments
+        if not raw_line or raw_line.startswith(b'#'):
+            continue
+        line = raw_line.decode('utf-8')
+        
+        # Simple format: just package spec
+        # Extract package name from spec
+        match = SPEC_NAME_RE.match(line)
+        name = match.group(0) if match else line
+        
+        packages_data.append(make_package_info(name, line))
     
     return packages_data
 
@@ -248,43 +347,50 @@ def topological_sort(packages_data):
     """Sort packages based on build_dependencies using topological sort."""
     # Build a mapping from package names to package data
     pkg_map = {pkg['name']: pkg for pkg in packages_data}
-    
-    # Build adjacency list (package -> list of packages that depend on it)
-    graph = {pkg['name']: [] for pkg in packages_data}
-    in_degree = {pkg['name']: 0 for pkg in packages_data}
+    if len(pkg_map) != len(packages_data):
+        seen = set()
+        duplicates = {}
+        for pkg in packages_data:
+            if pkg['name'] in seen:
+                duplicates[pkg['name']] = None
+            seen.add(pkg['name'])
+        print(f"Error: Packages defined more than once: {', '.join(duplicates)}", file=sys.stderr)
+        sys.exit(1)
     
     # Track which packages are depended upon by others
     is_dependency_of_others = set()
     
+    sorter = TopologicalSorter()
     for pkg in packages_data:
+        known_deps = []
         for dep in pkg.get('build_dependencies', []):
             if dep in pkg_map:
-                graph[dep].append(pkg['name'])
-                in_degree[pkg['name']] += 1
+                known_deps.append(dep)
                 is_dependency_of_others.add(dep)  # Mark this package as a dependency
             else:
                 print(f"Warning: Package {pkg['name']} depends on {dep} which is not in the package list", file=sys.stderr)
+        sorter.add(pkg['name'], *known_deps)
+    
+    try:
+        sorter.prepare()
+    except CycleError as e:
+        cycle = dict.fromkeys(e.args[1])
+        print(f"Error: Circular dependency detected among packages: {', '.join(cycle)}", file=sys.stderr)
+        sys.exit(1)
     
-    # Kahn's algorithm for topological sort
-    queue = [name for name, degree in in_degree.items() if degree == 0]
+    # Packages ready to build are kept in a min-heap so they come out in
+    # sorted order for deterministic output
+    queue = list(sorter.get_ready())
+    heapq.heapify(queue)
     sorted_packages = []
     
     while queue:
-        # Sort queue for deterministic output
-        queue.sort()
-        current = queue.pop(0)
+        current = heapq.heappop(queue)
         sorted_packages.append(pkg_map[current])
         
-        for neighbor in graph[current]:
-            in_degree[neighbor] -= 1
-            if in_degree[neighbor] == 0:
-                queue.append(neighbor)
-    
-    # Check for cycles
-    if len(sorted_packages) != len(packages_data):
-        remaining = [name for name, degree in in_degree.items() if degree > 0]
-        print(f"Error: Circular dependency detected among packages: {', '.join(remaining)}", file=sys.stderr)
-        sys.exit(1)
+        sorter.done(current)
+        for name in sorter.get_ready():
+            heapq.heappush(queue, name)
     
     # Calculate and add dependency levels
     levels = calculate_dependency_levels(sorted_packages)
@@ -296,6 +402,53 @@ def topological_sort(packages_data):
     return sorted_packages
 
 
+def package_positions(sorted_packages):
+    """Map each package name to its position in the sorted package list."""
+    return {pkg['name']: i for i, pkg in enumerate(sorted_packages)}
+
+
+def write_json(packages_data):
+    """Write packages to stdout as compact UTF-8 JSON, using orjson if it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+    
+    if orjson is not None:
+        payload = orjson.dumps(packages_data)
+    else:
+        # Same output as orjson: no whitespace, non-ASCII characters left unescaped
+        payload = json.dumps(packages_data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    
+    sys.stdout.flush()
+    sys.stdout.buffer.write(payload + b'\n')
+    sys.stdout.buffer.flush()
+
+
+def format_summary(packages_data):
+    """Format a human-readable summary of the sorted packages, grouped by dependency level."""
+    lines = [f"\nFound {len(packages_data)} packages:"]
+    
+    # Group by dependency level
+    max_level = max(pkg.get('dependency_level', 0) for pkg in packages_data)
+    for level in range(max_level + 1):
+        level_packages = [pkg for pkg in packages_data if pkg.get('dependency_level', 0) == level]
+        if level_packages:
+            lines.append(f"\n  Level {level} ({len(level_packages)} packages):")
+            for pkg in level_packages:
+                info_parts = []
+                if pkg['host_dependencies']:
+                    info_parts.append(f"host deps: {', '.join(pkg['host_dependencies'])}")
+                if pkg.get('build_dependencies'):
+                    info_parts.append(f"build deps: {', '.join(pkg['build_dependencies'])}")
+                if pkg['patches']:
+                    info_parts.append(f"patches: {len(pkg['patches'])}")
+                info = f" ({'; '.join(info_parts)})" if info_parts else ""
+                lines.append(f"    - {pkg['spec']}{info}")
+    
+    return '\n'.join(lines) + '\n'
+
+
 def main():
     # Priority: recipes/ > packages.yaml > packages.txt
     recipes_dir = Path('recipes')
@@ -314,13 +467,17 @@ def main():
         print("Reading from packages.yaml", file=sys.stderr)
         yaml_packages = read_yaml_config(yaml_file)
         
-        # Merge with recipes, avoiding duplicates
-        existing_names = {pkg['name'] for pkg in packages_data}
+        # Merge with recipes, avoiding duplicates; dicts keep insertion order.
+        # Recipes are kept as they are, so topological_sort() still reports
+        # names defined by more than one recipe
+        recipe_names = {pkg['name'] for pkg in packages_data}
+        merged = {}
         for pkg in yaml_packages:
-            if pkg['name'] not in existing_names:
-                packages_data.append(pkg)
-            else:
+            if pkg['name'] in recipe_names:
                 print(f"  Note: {pkg['name']} already defined in recipes/, skipping from packages.yaml", file=sys.stderr)
+            elif merged.setdefault(pkg['name'], pkg) is not pkg:
+                print(f"  Note: {pkg['name']} defined more than once in packages.yaml, keeping the first", file=sys.stderr)
+        packages_data = packages_data + list(merged.values())
     
     # 3. Fall back to packages.txt
     if not packages_data and txt_file.exists():
@@ -335,28 +492,11 @@ def main():
     packages_data = topological_sort(packages_data)
     
     # Output as JSON
-    print(json.dumps(packages_data))
-    
-    # Also output summary to stderr for logging
-    print(f"\nFound {len(packages_data)} packages:", file=sys.stderr)
+    write_json(packages_data)
     
-    # Group by dependency level
-    max_level = max(pkg.get('dependency_level', 0) for pkg in packages_data)
-    for level in range(max_level + 1):
-        level_packages = [pkg for pkg in packages_data if pkg.get('dependency_level', 0) == level]
-        if level_packages:
-            print(f"\n  Level {level} ({len(level_packages)} packages):", file=sys.stderr)
-            for pkg in level_packages:
-                info_parts = []
-                if pkg['host_dependencies']:
-                    info_parts.append(f"host deps: {', '.join(pkg['host_dependencies'])}")
-                if pkg.get('build_dependencies'):
-                    info_parts.append(f"build deps: {', '.join(pkg['build_dependencies'])}")
-                if pkg['patches']:
-                    info_parts.append(f"patches: {len(pkg['patches'])}")
-                info = f" ({'; '.join(info_parts)})" if info_parts else ""
-                print(f"    - {pkg['spec']}{info}", file=sys.stderr)
-
+    # Also output summary to stderr for logging, unless disabled
+    if os.environ.get('READ_PACKAGES_VERBOSE', '1') != '0':
+        sys.stderr.write(format_summary(packages_data))
 
 if __name__ == '__main__':
     main()
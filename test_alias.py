@@ -110,9 +110,12 @@ def test_alias_index_generation():
         import hashlib
         
         def get_hash(filepath):
-            hash_obj = hashlib.sha256()
             with open(filepath, 'rb') as f:
-                hash_obj.update(f.read())
+                if hasattr(hashlib, 'file_digest'):
+                    return hashlib.file_digest(f, 'sha256').hexdigest()
+                hash_obj = hashlib.sha256()
+                while chunk := f.read(1 << 20):
+                    hash_obj.update(chunk)
             return hash_obj.hexdigest()
         
         pyyaml_hash = get_hash(pyyaml_wheel)
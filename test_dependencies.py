@@ -5,12 +5,15 @@ Test dependency resolution and build order functionality.
 
 import sys
 import json
+import subprocess
+import tempfile
 from pathlib import Path
 
 # Add the project root to the path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from read_packages import topological_sort
+from read_packages import (topological_sort, package_positions, load_yaml,
+                           load_recipe_cache, save_recipe_cache)
 
 
 def test_basic_dependency_order():
@@ -23,14 +26,15 @@ def test_basic_dependency_order():
     
     sorted_packages = topological_sort(packages)
     names = [pkg['name'] for pkg in sorted_packages]
+    positions = package_positions(sorted_packages)
     
     # package-a should come before package-b and package-c
     # package-b should come before package-c
-    assert names.index('package-a') < names.index('package-b'), \
+    assert positions['package-a'] < positions['package-b'], \
         f"package-a should come before package-b, got order: {names}"
-    assert names.index('package-a') < names.index('package-c'), \
+    assert positions['package-a'] < positions['package-c'], \
         f"package-a should come before package-c, got order: {names}"
-    assert names.index('package-b') < names.index('package-c'), \
+    assert positions['package-b'] < positions['package-c'], \
         f"package-b should come before package-c, got order: {names}"
     
     print(f"✓ Basic dependency order test passed: {names}")
@@ -54,6 +58,24 @@ def test_no_dependencies():
     print(f"✓ No dependencies test passed: {names}")
 
 
+def test_ready_packages_order():
+    """Test that the lowest-named ready package is always built next."""
+    packages = [
+        {'name': 'package-c', 'build_dependencies': []},
+        {'name': 'package-b', 'build_dependencies': ['package-a']},
+        {'name': 'package-a', 'build_dependencies': []},
+    ]
+    
+    sorted_packages = topological_sort(packages)
+    names = [pkg['name'] for pkg in sorted_packages]
+    
+    # package-b becomes ready once package-a is built, and sorts before package-c
+    assert names == ['package-a', 'package-b', 'package-c'], \
+        f"Expected lowest-named ready package first, got: {names}"
+    
+    print(f"✓ Ready packages order test passed: {names}")
+
+
 def test_complex_dependencies():
     """Test a more complex dependency graph."""
     packages = [
@@ -66,17 +88,18 @@ def test_complex_dependencies():
     
     sorted_packages = topological_sort(packages)
     names = [pkg['name'] for pkg in sorted_packages]
+    positions = package_positions(sorted_packages)
     
     # core should come first
-    assert names.index('core') < names.index('lib-a'), \
+    assert positions['core'] < positions['lib-a'], \
         f"core should come before lib-a, got order: {names}"
-    assert names.index('core') < names.index('lib-b'), \
+    assert positions['core'] < positions['lib-b'], \
         f"core should come before lib-b, got order: {names}"
     
     # lib-a and lib-b should come before app
-    assert names.index('lib-a') < names.index('app'), \
+    assert positions['lib-a'] < positions['app'], \
         f"lib-a should come before app, got order: {names}"
-    assert names.index('lib-b') < names.index('app'), \
+    assert positions['lib-b'] < positions['app'], \
         f"lib-b should come before app, got order: {names}"
     
     # utils has no dependencies or dependents, so can be anywhere
@@ -97,6 +120,21 @@ def test_circular_dependency():
         print("✓ Circular dependency detection test passed")
 
 
+def test_duplicate_package_names():
+    """Test that packages defined more than once are rejected."""
+    packages = [
+        {'name': 'package-a', 'build_dependencies': []},
+        {'name': 'package-a', 'build_dependencies': []},
+        {'name': 'package-b', 'build_dependencies': ['package-a']},
+    ]
+    
+    try:
+        topological_sort(packages)
+        assert False, "Should have rejected the duplicate package"
+    except SystemExit:
+        print("✓ Duplicate package detection test passed")
+
+
 def test_missing_dependency_warning():
     """Test that missing dependencies are handled gracefully."""
     packages = [
@@ -119,14 +157,74 @@ def test_real_world_scenario():
     
     sorted_packages = topological_sort(packages)
     names = [pkg['name'] for pkg in sorted_packages]
+    positions = package_positions(sorted_packages)
     
     # cffi should come before cryptography
-    assert names.index('cffi') < names.index('cryptography'), \
+    assert positions['cffi'] < positions['cryptography'], \
         f"cffi should come before cryptography, got order: {names}"
     
     print(f"✓ Real-world scenario test passed: {names}")
 
 
+def test_txt_config_does_not_import_yaml():
+    """Test that reading only packages.txt does not import PyYAML."""
+    script = Path(__file__).parent / 'read_packages.py'
+    check = (
+        "import runpy, sys\n"
+        f"try: runpy.run_path({str(script)!r}, run_name='__main__')\n"
+        "finally: sys.stderr.write(f'yaml imported: {\"yaml\" in sys.modules}\\n')\n"
+    )
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        (Path(tmpdir) / 'packages.txt').write_text("numpy==1.0\n")
+        result = subprocess.run([sys.executable, '-c', check], cwd=tmpdir,
+                                capture_output=True, text=True)
+    
+    assert result.returncode == 0, f"read_packages.py failed: {result.stderr}"
+    assert json.loads(result.stdout)[0]['name'] == 'numpy', \
+        f"Unexpected output: {result.stdout}"
+    assert 'yaml imported: False' in result.stderr, \
+        f"PyYAML was imported for a packages.txt-only configuration: {result.stderr}"
+    
+    print("✓ packages.txt without PyYAML test passed")
+
+
+def test_recipe_cache():
+    """Test that parsed recipes are served from the cache only while unchanged."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        recipe = Path(tmpdir) / 'meta.yaml'
+        dated = Path(tmpdir) / 'dated.yaml'
+        cache_file = Path(tmpdir) / '.cache' / 'recipes.json'
+        recipe.write_text("package:\n  name: a\n")
+        dated.write_text("released: 2024-01-01\n")
+        
+        cache = {}
+        assert load_yaml(recipe, cache) == {'package': {'name': 'a'}}
+        load_yaml(dated, cache)
+        save_recipe_cache(cache_file, cache)
+        
+        # Entries that do not survive a JSON round trip are left out
+        cache = load_recipe_cache(cache_file)
+        assert list(cache) == [str(recipe)], f"Unexpected cache entries: {list(cache)}"
+        
+        # An unchanged file is served from the cache without being parsed
+        cache[str(recipe)]['data'] = 'cached'
+        assert load_yaml(recipe, cache) == 'cached', "Cache hit was not used"
+        
+        # An edited file is parsed again
+        recipe.write_text("package:\n  name: edited\n")
+        assert load_yaml(recipe, cache) == {'package': {'name': 'edited'}}, \
+            "Edited recipe was served from the cache"
+        
+        # Malformed caches and entries are treated as misses
+        cache_file.write_text('[]')
+        assert load_recipe_cache(cache_file) == {}
+        cache = {str(recipe): {'size': recipe.stat().st_size, 'mtime_ns': recipe.stat().st_mtime_ns}}
+        assert load_yaml(recipe, cache) == {'package': {'name': 'edited'}}
+    
+    print("✓ Recipe cache test passed")
+
+
 if __name__ == '__main__':
     print("="*60)
     print("Testing dependency resolution and build order")
@@ -134,10 +232,14 @@ if __name__ == '__main__':
     
     test_basic_dependency_order()
     test_no_dependencies()
+    test_ready_packages_order()
     test_complex_dependencies()
     test_circular_dependency()
+    test_duplicate_package_names()
     test_missing_dependency_warning()
     test_real_world_scenario()
+    test_txt_config_does_not_import_yaml()
+    test_recipe_cache()
     
     print("\n" + "="*60)
     print("✓ All dependency resolution tests passed!")
@@ -12,7 +12,17 @@ from pathlib import Path
 
 # Import the function we're testing
 sys.path.insert(0, os.path.dirname(__file__))
-from generate_index import get_package_name_from_wheel, generate_package_index, generate_root_index
+from generate_index import (
+    get_package_name_from_wheel,
+    generate_package_index,
+    generate_root_index,
+    calculate_hash,
+    hash_all,
+    load_hash_cache,
+    iter_wheels,
+    stage_wheel,
+    write_hash_sidecar,
+)
 
 
 def test_get_package_name_from_wheel():
@@ -31,6 +41,9 @@ def test_get_package_name_from_wheel():
         ("my-package-1.0.0-cp314-cp314-android.whl", "my-package"),
         ("some-hyphenated-name-2.1.0-cp314-cp314-android.whl", "some-hyphenated-name"),
         ("My-Hyphenated-Package-1.5.0-cp314-cp314-ios.whl", "My-Hyphenated-Package"),
+        # Test optional build tags
+        ("numpy-1.24.0-1-cp314-cp314-ios_arm64.whl", "numpy"),
+        ("My-Hyphenated-Package-1.5.0-2b-cp314-cp314-ios.whl", "My-Hyphenated-Package"),
     ]
     
     all_passed = True
@@ -69,8 +82,7 @@ def test_separate_case_packages():
         from collections import defaultdict
         packages = defaultdict(list)
         
-        for wheel_path in wheels_dir.glob('**/*.whl'):
-            wheel_file = wheel_path.name
+        for wheel_file, wheel_path in iter_wheels(wheels_dir):
             package_name = get_package_name_from_wheel(wheel_file)
             
             if package_name:
@@ -89,6 +101,98 @@ def test_separate_case_packages():
             return False
 
 
+def test_hash_cache():
+    """Test that cached hashes are reused and stale entries are dropped."""
+    print("\nTesting hash cache...")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        wheel_a = Path(tmpdir) / "a-1.0-cp314-cp314-android.whl"
+        wheel_b = Path(tmpdir) / "b-1.0-cp314-cp314-android.whl"
+        wheel_a.write_bytes(b"wheel a")
+        wheel_b.write_bytes(b"wheel b")
+        
+        cache = {}
+        hashes = hash_all([wheel_a, wheel_b], cache)
+        if hashes != {wheel_a: calculate_hash(wheel_a), wheel_b: calculate_hash(wheel_b)}:
+            print(f"  ✗ Unexpected hashes: {hashes}")
+            return False
+        
+        # A cached entry must be used instead of re-hashing the file
+        key_a = next(key for key in cache if key.startswith(str(wheel_a)))
+        cache[key_a] = "cached"
+        hashes = hash_all([wheel_a], cache)
+        if hashes[wheel_a] != "cached":
+            print(f"  ✗ Cached hash was not reused: {hashes[wheel_a]}")
+            return False
+        
+        # Entries for wheels not seen in this run must be dropped
+        if len(cache) != 1:
+            print(f"  ✗ Stale cache entries were kept: {cache}")
+            return False
+        
+        # A cache file that is not a JSON object must be ignored
+        cache_file = Path(tmpdir) / "wheel-hashes.json"
+        cache_file.write_text("[]")
+        if load_hash_cache(cache_file) != {}:
+            print(f"  ✗ Malformed cache was loaded: {load_hash_cache(cache_file)}")
+            return False
+        
+        print("  ✓ Cached hashes reused and stale entries dropped")
+        return True
+
+
+def test_hash_sidecar():
+    """Test that a {wheel}.sha256 sidecar file is used instead of hashing the wheel."""
+    print("\nTesting hash sidecar files...")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        wheel_path = Path(tmpdir) / "a-1.0-cp314-cp314-android.whl"
+        wheel_path.write_bytes(b"wheel a")
+        real_hash = calculate_hash(wheel_path)
+        
+        # A malformed sidecar must be ignored
+        sidecar_path = Path(tmpdir) / "a-1.0-cp314-cp314-android.whl.sha256"
+        sidecar_path.write_text("not a hash\n")
+        if calculate_hash(wheel_path) != real_hash:
+            print("  ✗ Malformed sidecar was not ignored")
+            return False
+        
+        sidecar_hash = "0" * 64
+        write_hash_sidecar(wheel_path, sidecar_hash)
+        if calculate_hash(wheel_path) != sidecar_hash:
+            print("  ✗ Sidecar hash was not used")
+            return False
+        
+        # A sidecar older than the wheel (wheel rebuilt since) must be ignored
+        sidecar_mtime = sidecar_path.stat().st_mtime
+        os.utime(wheel_path, (sidecar_mtime + 10, sidecar_mtime + 10))
+        if calculate_hash(wheel_path) != real_hash:
+            print("  ✗ Stale sidecar was not ignored")
+            return False
+        
+        print("  ✓ Sidecar hash used, malformed and stale sidecars ignored")
+        return True
+
+
+def test_stage_wheel_onto_itself():
+    """Test that staging a wheel onto its own path leaves the wheel intact."""
+    print("\nTesting staging a wheel onto itself...")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        wheel_path = Path(tmpdir) / "a-1.0-cp314-cp314-android.whl"
+        wheel_path.write_bytes(b"wheel a")
+        
+        # Same file, reached through a different path string
+        stage_wheel(Path(tmpdir) / "." / wheel_path.name, wheel_path)
+        
+        if not wheel_path.exists() or wheel_path.read_bytes() != b"wheel a":
+            print("  ✗ Source wheel was removed or changed")
+            return False
+        
+        print("  ✓ Source wheel left intact")
+        return True
+
+
 def main():
     print("=" * 60)
     print("Testing generate_index.py case sensitivity")
@@ -96,9 +200,12 @@ def main():
     
     test1_passed = test_get_package_name_from_wheel()
     test2_passed = test_separate_case_packages()
+    test3_passed = test_hash_cache()
+    test4_passed = test_hash_sidecar()
+    test5_passed = test_stage_wheel_onto_itself()
     
     print("\n" + "=" * 60)
-    if test1_passed and test2_passed:
+    if test1_passed and test2_passed and test3_passed and test4_passed and test5_passed:
         print("✓ All tests passed!")
         return 0
     else: